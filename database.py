@@ -3,9 +3,12 @@ Database Helper Functions
 
 MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
+
+The client is Motor's AsyncIOMotorClient, so every collection call returns an
+awaitable and never blocks the event loop.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
@@ -22,11 +25,40 @@ database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    # tz_aware so reads return UTC-aware datetimes, like the ones we write
+    _client = AsyncIOMotorClient(database_url, tz_aware=True)
     db = _client[database_name]
 
+
+def utcnow() -> datetime:
+    """Current UTC time truncated to BSON's millisecond precision"""
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+async def connect_db():
+    """Open the connection pool eagerly (call from the app lifespan)"""
+    if db is not None:
+        await db.command("ping")
+
+
+async def ensure_indexes():
+    """Create indexes on the fields hot endpoints filter by"""
+    if db is None:
+        return
+    await db["user"].create_index("email", unique=True)
+    await db["order"].create_index("user_email")
+    await db["product"].create_index("category")
+
+
+def close_db():
+    """Close the connection pool"""
+    if _client is not None:
+        _client.close()
+
+
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -37,19 +69,20 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     else:
         data_dict = data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
+    now = utcnow()
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
+
     cursor = db[collection_name].find(filter_dict or {})
     if limit:
         cursor = cursor.limit(limit)
-    
-    return list(cursor)
+
+    return await cursor.to_list(length=None)
@@ -1,42 +1,193 @@
 import os
-from fastapi import FastAPI, HTTPException, Header, Query
+import re
+import logging
+import secrets
+import time
+import jwt
+import msgspec
+import email_validator
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional, Dict, Any
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.decorator import cache
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter, model_validator
+from typing import Annotated, List, Literal, Optional, Dict, Any, Tuple, Union
 from bson import ObjectId
-from datetime import datetime, timezone
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from datetime import datetime, timedelta, timezone
 
-from database import db, create_document, get_documents
+from database import db, connect_db, close_db, ensure_indexes, utcnow
 
-app = FastAPI(title="ByteRize API")
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # open the Mongo connection pool before serving the first request; a
+    # database problem must not stop the app from booting, /test reports it
+    try:
+        await connect_db()
+        await ensure_indexes()
+        await bootstrap_admin()
+    except PyMongoError:
+        logger.exception("Database startup failed; serving in degraded mode")
+    FastAPICache.init(InMemoryBackend())
+    yield
+    close_db()
+
+
+app = FastAPI(title="ByteRize API", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# FRONTEND_URL may be a comma-separated list; unset means any origin, in which
+# case credentials must stay off (browsers reject "*" with credentials)
+FRONTEND_URL = os.getenv("FRONTEND_URL")
+cors_origins = [o.strip() for o in FRONTEND_URL.split(",") if o.strip()] if FRONTEND_URL else ["*"]
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=cors_origins,
+    allow_credentials=cors_origins != ["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,  # let browsers cache preflight results for a day
 )
+# list responses are repetitive JSON and compress well; small bodies are left alone
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 
 # ---------------------- Helpers ----------------------
 
-def oid_to_str(doc: Dict[str, Any]) -> Dict[str, Any]:
-    if not doc:
-        return doc
-    d = {**doc}
-    if d.get("_id") is not None:
-        d["id"] = str(d.pop("_id"))
-    # convert datetime to iso
-    for k, v in list(d.items()):
-        if isinstance(v, datetime):
-            d[k] = v.isoformat()
-    return d
-
-
-def require_admin(x_admin: Optional[str]):
-    if x_admin != "true":
+# argon2 is deliberately slow, so hash/verify run on the thread pool.
+# "plaintext" matches legacy demo passwords stored before hashing; it is
+# deprecated, so verify_and_update re-hashes them with argon2 on login.
+pwd_ctx = CryptContext(schemes=["argon2", "plaintext"], deprecated=["plaintext"])
+
+
+async def bootstrap_admin():
+    """Upsert the admin account from ADMIN_EMAIL/ADMIN_PASSWORD, if both are set.
+
+    Admins can only be registered by another admin, so this is how the
+    first one is created. The env password is authoritative on every boot.
+    """
+    email = os.getenv("ADMIN_EMAIL")
+    password = os.getenv("ADMIN_PASSWORD")
+    if db is None or not email or not password:
+        return
+    email = email_validator.validate_email(email, check_deliverability=False).normalized
+    hashed = await run_in_threadpool(pwd_ctx.hash, password)
+    now = utcnow()
+    await db["user"].update_one(
+        {"email": email},
+        {
+            "$set": {"password": hashed, "role": "admin", "approved": True, "updated_at": now},
+            "$setOnInsert": {"name": "Admin", "created_at": now},
+        },
+        upsert=True,
+    )
+
+# server-side shaping for list endpoints: only the returned fields leave
+# Mongo and `_id` arrives already stringified as `id`
+PRODUCT_LIST_PROJECTION = {
+    "_id": 0,
+    "id": {"$toString": "$_id"},
+    "title": 1,
+    "description": 1,
+    "price": 1,
+    "category": 1,
+    "image": 1,
+    "in_stock": 1,
+    "stock_qty": 1,
+    "created_at": 1,
+}
+
+ORDER_LIST_PROJECTION = {
+    "_id": 0,
+    "id": {"$toString": "$_id"},
+    "user_email": 1,
+    # line items are only served by GET /api/orders/{order_id}
+    "item_count": {"$size": {"$ifNull": ["$items", []]}},
+    "total": 1,
+    "status": 1,
+    "created_at": 1,
+    "updated_at": 1,
+}
+
+
+_OID_RE = re.compile(r"[0-9a-fA-F]{24}")
+
+
+def parse_oid(value: str, kind: str = "product") -> ObjectId:
+    if not _OID_RE.fullmatch(value):
+        raise HTTPException(status_code=400, detail=f"Invalid {kind} id")
+    return ObjectId(value)
+
+
+def to_cents(amount: float) -> int:
+    return int(round(amount * 100))
+
+
+# documents per getMore round-trip on list cursors
+LIST_BATCH_SIZE = 500
+
+NDJSON = "application/x-ndjson"
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON in request.headers.get("accept", "")
+
+
+def ndjson_stream(cursor, model) -> StreamingResponse:
+    """Stream a cursor as one JSON document per line, without buffering it"""
+    async def lines():
+        async for doc in cursor:
+            yield model.from_db(doc).model_dump_json() + "\n"
+    return StreamingResponse(lines(), media_type=NDJSON)
+
+
+# set JWT_SECRET in production; the random fallback invalidates tokens on
+# restart and is not shared between worker processes
+JWT_SECRET = os.getenv("JWT_SECRET") or secrets.token_urlsafe(32)
+JWT_TTL = timedelta(hours=12)
+
+
+def create_token(user: Dict[str, Any]) -> str:
+    claims = {
+        "sub": user["email"],
+        "role": user.get("role", "customer"),
+        "exp": datetime.now(timezone.utc) + JWT_TTL,
+    }
+    return jwt.encode(claims, JWT_SECRET, algorithm="HS256")
+
+
+def current_claims(authorization: Optional[str] = Header(None)) -> Optional[Dict[str, Any]]:
+    """Decoded bearer token claims, or None when missing/invalid"""
+    if not authorization:
+        return None
+    try:
+        return jwt.decode(authorization.removeprefix("Bearer "), JWT_SECRET, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return None
+
+
+def require_user(claims: Optional[Dict[str, Any]] = Depends(current_claims)) -> Dict[str, Any]:
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return claims
+
+
+def require_admin(claims: Dict[str, Any] = Depends(require_user)) -> Dict[str, Any]:
+    if claims.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
+    return claims
 
 
 # ---------------------- Schemas ----------------------
@@ -55,7 +206,7 @@ class UserRegister(BaseModel):
     name: str
     email: EmailStr
     password: str
-    role: str = "customer"  # customer | admin
+    role: Literal["customer", "admin"] = "customer"
 
 
 class LoginReq(BaseModel):
@@ -70,21 +221,180 @@ class OrderItem(BaseModel):
     quantity: int = Field(..., ge=1)
 
 
-class OrderIn(BaseModel):
-    user_email: EmailStr
+# Order bodies are the largest POST payloads, so they are decoded and
+# validated in one pass with msgspec instead of json.loads + Pydantic.
+# The email is checked and normalised in order_body, like EmailStr does.
+Email = Annotated[str, msgspec.Meta(extra_json_schema={"format": "email"})]
+
+
+class OrderItemIn(msgspec.Struct):
+    product_id: str
+    title: str
+    price: float
+    quantity: Annotated[int, msgspec.Meta(ge=1)]
+
+
+class OrderIn(msgspec.Struct):
+    user_email: Email
+    items: List[OrderItemIn]
+    total: Annotated[float, msgspec.Meta(ge=0)]
+
+
+def struct_schema(struct: type) -> Dict[str, Any]:
+    """Self-contained JSON schema for a msgspec Struct (for openapi_extra)"""
+    (schema,), defs = msgspec.json.schema_components([struct], ref_template="{name}")
+
+    def resolve(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(defs[node["$ref"]])
+            return {k: resolve(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [resolve(v) for v in node]
+        return node
+
+    return resolve(schema)
+
+
+def msgspec_loc(path: str) -> Tuple[Union[str, int], ...]:
+    """`$.items[0].quantity` -> ("body", "items", 0, "quantity")"""
+    parts = re.findall(r"\.(\w+)|\[(\d+)\]", path)
+    return ("body", *(key if key else int(idx) for key, idx in parts))
+
+
+def msgspec_error(e: msgspec.ValidationError, body: bytes) -> Dict[str, Any]:
+    """Translate a msgspec ValidationError into a FastAPI-style error item"""
+    msg, _, path = str(e).partition(" - at ")
+    loc = msgspec_loc(path.strip("`"))
+    # the body is valid JSON by now; walk it to report the offending input
+    value = msgspec.json.decode(body)
+    for key in loc[1:]:
+        value = value[key]
+    missing = re.match(r"Object missing required field `(\w+)`", msg)
+    if missing:
+        return {"type": "missing", "loc": (*loc, missing.group(1)), "msg": "Field required", "input": value}
+    return {"type": "value_error", "loc": loc, "msg": msg, "input": value}
+
+
+async def order_body(request: Request) -> OrderIn:
+    # errors are raised as RequestValidationError so clients get FastAPI's
+    # usual 422 body ({"detail": [{"type", "loc", "msg", "input"}]});
+    # strict=False keeps Pydantic's lax coercion (e.g. "1.5" -> 1.5)
+    body = await request.body()
+    try:
+        order = msgspec.json.decode(body, type=OrderIn, strict=False)
+    except msgspec.ValidationError as e:
+        raise RequestValidationError([msgspec_error(e, body)])
+    except msgspec.DecodeError as e:
+        raise RequestValidationError([{
+            "type": "json_invalid",
+            "loc": ("body",),
+            "msg": "JSON decode error",
+            "input": {},
+            "ctx": {"error": str(e)},
+        }])
+    try:
+        order.user_email = email_validator.validate_email(order.user_email, check_deliverability=False).normalized
+    except email_validator.EmailNotValidError as e:
+        raise RequestValidationError([{
+            "type": "value_error",
+            "loc": ("body", "user_email"),
+            "msg": f"value is not a valid email address: {e}",
+            "input": order.user_email,
+        }])
+    return order
+
+
+class MongoOut(BaseModel):
+    """Base for response models built from Mongo documents (`_id` -> `id`)"""
+    id: str
+
+    @model_validator(mode="before")
+    @classmethod
+    def _id_to_id(cls, data: Any) -> Any:
+        if isinstance(data, dict) and "_id" in data:
+            data = {**data}
+            data["id"] = str(data.pop("_id"))
+        return data
+
+    @classmethod
+    def from_db(cls, doc: Dict[str, Any]):
+        """Build from a stored document without re-validating it (validated on write)"""
+        if "_id" in doc:
+            doc["id"] = str(doc.pop("_id"))
+        return cls.model_construct(**doc)
+
+
+class ProductListOut(MongoOut):
+    title: str
+    description: Optional[str] = None
+    price: float
+    category: str = "Computers"
+    image: Optional[str] = None
+    in_stock: bool = True
+    stock_qty: int = 0
+    created_at: Optional[datetime] = None
+
+
+class ProductOut(ProductListOut):
+    updated_at: Optional[datetime] = None
+
+
+class UserOut(MongoOut):
+    name: str
+    email: str
+    role: str = "customer"
+    approved: bool = False
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class OrderBase(MongoOut):
+    user_email: str
+    total: float
+    status: str = "pending"
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+
+class OrderListOut(OrderBase):
+    item_count: int = 0
+
+
+class OrderOut(OrderBase):
     items: List[OrderItem]
-    total: float = Field(..., ge=0)
+
+
+# built once at import and reused, so list endpoints don't rebuild
+# validators/serializers per request
+PRODUCT_LIST_ADAPTER = TypeAdapter(List[ProductListOut])
+USER_LIST_ADAPTER = TypeAdapter(List[UserOut])
+ORDER_LIST_ADAPTER = TypeAdapter(List[OrderListOut])
 
 
 # ---------------------- Root & Health ----------------------
 
+# health probes can be polled every second; avoid a listCollections per probe
+COLLECTIONS_TTL = 30.0
+DATABASE_URL_STATUS = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
+_collections_cache: Optional[Tuple[float, List[str]]] = None
+
+
+async def cached_collection_names() -> List[str]:
+    global _collections_cache
+    now = time.monotonic()
+    if _collections_cache is None or now - _collections_cache[0] > COLLECTIONS_TTL:
+        _collections_cache = (now, await db.list_collection_names())
+    return _collections_cache[1]
+
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "ByteRize FastAPI Backend Running"}
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -96,11 +406,11 @@ def test_database():
     try:
         if db is not None:
             response["database"] = "✅ Available"
-            response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
+            response["database_url"] = DATABASE_URL_STATUS
             response["database_name"] = getattr(db, "name", None) or "❌ Unknown"
             # list collections
             try:
-                collections = db.list_collection_names()
+                collections = await cached_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
                 response["connection_status"] = "Connected"
@@ -115,62 +425,90 @@ def test_database():
 
 # ---------------------- Products ----------------------
 
-@app.get("/api/products")
-def list_products() -> List[Dict[str, Any]]:
-    docs = get_documents("product")
-    return [oid_to_str(d) for d in docs]
+def product_list_cursor():
+    return db["product"].aggregate([{"$project": PRODUCT_LIST_PROJECTION}], batchSize=LIST_BATCH_SIZE)
+
+
+@cache(expire=60, namespace="products")
+async def cached_product_list() -> List[Dict[str, Any]]:
+    docs = await product_list_cursor().to_list(length=None)
+    return PRODUCT_LIST_ADAPTER.dump_python([ProductListOut.from_db(d) for d in docs], mode="json")
+
+
+@app.get("/api/products", response_model=None, responses={200: {"model": List[ProductListOut], "content": {NDJSON: {}}}})
+async def list_products(request: Request) -> Union[List[Dict[str, Any]], StreamingResponse]:
+    if wants_ndjson(request):
+        return ndjson_stream(product_list_cursor(), ProductListOut)
+    return await cached_product_list()
 
 
 @app.post("/api/products")
-def create_product(product: ProductIn, x_admin: Optional[str] = Header(None)) -> Dict[str, Any]:
-    require_admin(x_admin)
+async def create_product(product: ProductIn, _: Dict[str, Any] = Depends(require_admin)) -> ProductOut:
     data = product.model_dump()
-    now = datetime.now(timezone.utc)
-    data.update({"created_at": now, "updated_at": now})
-    inserted_id = db["product"].insert_one(data).inserted_id
-    created = db["product"].find_one({"_id": inserted_id})
-    return oid_to_str(created)
+    now = utcnow()
+    data.update({"_id": ObjectId(), "created_at": now, "updated_at": now})
+    await db["product"].insert_one(data)
+    await FastAPICache.clear(namespace="products")
+    return data
 
 
 @app.delete("/api/products/{product_id}")
-def delete_product(product_id: str, x_admin: Optional[str] = Header(None)) -> Dict[str, str]:
-    require_admin(x_admin)
-    try:
-        res = db["product"].delete_one({"_id": ObjectId(product_id)})
-        if res.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Product not found")
-        return {"status": "ok"}
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid product id")
+async def delete_product(product_id: str, _: Dict[str, Any] = Depends(require_admin)) -> Dict[str, str]:
+    res = await db["product"].delete_one({"_id": parse_oid(product_id)})
+    if res.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Product not found")
+    await FastAPICache.clear(namespace="products")
+    return {"status": "ok"}
 
 
 # ---------------------- Users ----------------------
 
 @app.post("/api/users/register")
-def register_user(user: UserRegister) -> Dict[str, Any]:
-    existing = db["user"].find_one({"email": user.email})
-    if existing:
-        raise HTTPException(status_code=400, detail="Email already registered")
+async def register_user(
+    user: UserRegister,
+    claims: Optional[Dict[str, Any]] = Depends(current_claims),
+) -> UserOut:
+    # only an existing admin may create another admin (the first one is
+    # seeded directly in the database)
+    if user.role == "admin" and (claims is None or claims.get("role") != "admin"):
+        raise HTTPException(status_code=403, detail="Admin access required")
     approved = True if user.role == "admin" else False
+    hashed = await run_in_threadpool(pwd_ctx.hash, user.password)
+    now = utcnow()
     doc = {
+        "_id": ObjectId(),
         "name": user.name,
         "email": user.email,
-        "password": user.password,  # NOTE: demo only; do NOT store plain text in production
+        "password": hashed,
         "role": user.role,
         "approved": approved,
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc),
+        "created_at": now,
+        "updated_at": now,
     }
-    inserted_id = db["user"].insert_one(doc).inserted_id
-    created = db["user"].find_one({"_id": inserted_id})
-    return oid_to_str(created)
+    try:
+        await db["user"].insert_one(doc)
+    except DuplicateKeyError:
+        # unique index on user.email
+        raise HTTPException(status_code=400, detail="Email already registered")
+    return doc
 
 
 @app.post("/api/users/login")
-def login(req: LoginReq) -> Dict[str, Any]:
-    user = db["user"].find_one({"email": req.email})
-    if not user or user.get("password") != req.password:
+async def login(req: LoginReq) -> Dict[str, Any]:
+    user = await db["user"].find_one({"email": req.email})
+    if not user:
+        # burn the same argon2 cost so timing doesn't reveal registered emails
+        await run_in_threadpool(pwd_ctx.dummy_verify)
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        ok, new_hash = await run_in_threadpool(pwd_ctx.verify_and_update, req.password, user.get("password"))
+    except (TypeError, ValueError):
+        # missing or malformed password hash
+        ok, new_hash = False, None
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        await db["user"].update_one({"_id": user["_id"]}, {"$set": {"password": new_hash, "updated_at": utcnow()}})
     if not user.get("approved"):
         raise HTTPException(status_code=403, detail="Account awaiting approval")
     return {
@@ -178,20 +516,24 @@ def login(req: LoginReq) -> Dict[str, Any]:
         "name": user.get("name"),
         "role": user.get("role", "customer"),
         "approved": True,
+        "access_token": create_token(user),
+        "token_type": "bearer",
     }
 
 
-@app.get("/api/users")
-def list_users(x_admin: Optional[str] = Header(None)) -> List[Dict[str, Any]]:
-    require_admin(x_admin)
-    users = list(db["user"].find({}, {"password": 0}))
-    return [oid_to_str(u) for u in users]
+@app.get("/api/users", response_model=None, responses={200: {"model": List[UserOut], "content": {NDJSON: {}}}})
+async def list_users(request: Request, _: Dict[str, Any] = Depends(require_admin)) -> Union[List[Dict[str, Any]], StreamingResponse]:
+    cursor = db["user"].find({}, {"password": 0}).batch_size(LIST_BATCH_SIZE)
+    if wants_ndjson(request):
+        return ndjson_stream(cursor, UserOut)
+    users = await cursor.to_list(length=None)
+    return USER_LIST_ADAPTER.dump_python([UserOut.from_db(u) for u in users], mode="json")
 
 
 @app.post("/api/users/{email}/approve")
-def approve_user(email: str, x_admin: Optional[str] = Header(None)) -> Dict[str, str]:
-    require_admin(x_admin)
-    res = db["user"].update_one({"email": email}, {"$set": {"approved": True, "updated_at": datetime.now(timezone.utc)}})
+async def approve_user(email: str, _: Dict[str, Any] = Depends(require_admin)) -> Dict[str, str]:
+    now = utcnow()
+    res = await db["user"].update_one({"email": email}, {"$set": {"approved": True, "updated_at": now}})
     if res.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     return {"status": "approved"}
@@ -199,41 +541,76 @@ def approve_user(email: str, x_admin: Optional[str] = Header(None)) -> Dict[str,
 
 # ---------------------- Orders ----------------------
 
-@app.post("/api/orders")
-def create_order(order: OrderIn) -> Dict[str, Any]:
-    # basic validation for totals
-    calc_total = sum(i.price * i.quantity for i in order.items)
-    if round(calc_total, 2) != round(order.total, 2):
+@app.post("/api/orders", openapi_extra={
+    "requestBody": {"required": True, "content": {"application/json": {"schema": struct_schema(OrderIn)}}},
+})
+async def create_order(order: OrderIn = Depends(order_body)) -> OrderOut:
+    # basic validation for totals, in integer cents to avoid float drift
+    total_cents = sum(to_cents(i.price) * i.quantity for i in order.items)
+    if total_cents != to_cents(order.total):
         raise HTTPException(status_code=400, detail="Total mismatch")
-    doc = order.model_dump()
-    now = datetime.now(timezone.utc)
-    doc.update({"status": "pending", "created_at": now, "updated_at": now})
-
-    # decrement stock quantities (best-effort/simple)
-    for item in order.items:
-        try:
-            db["product"].update_one(
-                {"_id": ObjectId(item.product_id), "stock_qty": {"$gte": item.quantity}},
-                {"$inc": {"stock_qty": -item.quantity}, "$set": {"updated_at": now}},
-            )
-        except Exception:
-            continue
-
-    inserted_id = db["order"].insert_one(doc).inserted_id
-    created = db["order"].find_one({"_id": inserted_id})
-    return oid_to_str(created)
-
-
-@app.get("/api/orders")
-def list_orders(email: Optional[EmailStr] = Query(None), x_admin: Optional[str] = Header(None)) -> List[Dict[str, Any]]:
+    oids = [parse_oid(i.product_id) for i in order.items]
+    doc = msgspec.to_builtins(order)
+    now = utcnow()
+    doc.update({"_id": ObjectId(), "status": "pending", "created_at": now, "updated_at": now})
+
+    # decrement stock quantities (best-effort/simple) in a single round-trip
+    # pipeline form so in_stock is recomputed from the new quantity atomically
+    ops = [
+        UpdateOne(
+            {"_id": oid, "stock_qty": {"$gte": item.quantity}},
+            [{"$set": {
+                "stock_qty": {"$subtract": ["$stock_qty", item.quantity]},
+                "in_stock": {"$gt": [{"$subtract": ["$stock_qty", item.quantity]}, 0]},
+                "updated_at": now,
+            }}],
+        )
+        for oid, item in zip(oids, order.items)
+    ]
+    if ops:
+        await db["product"].bulk_write(ops, ordered=False)
+        # stock levels changed
+        await FastAPICache.clear(namespace="products")
+
+    await db["order"].insert_one(doc)
+    return doc
+
+
+@app.get("/api/orders", response_model=None, responses={200: {"model": List[OrderListOut], "content": {NDJSON: {}}}})
+async def list_orders(
+    request: Request,
+    email: Optional[EmailStr] = Query(None),
+    claims: Dict[str, Any] = Depends(require_user),
+) -> Union[List[Dict[str, Any]], StreamingResponse]:
     q: Dict[str, Any] = {}
-    if email and x_admin != "true":
+    if claims.get("role") != "admin":
+        # customers only ever see their own orders, whatever `email` says
+        q["user_email"] = claims["sub"]
+    elif email:
         q["user_email"] = email
-    orders = list(db["order"].find(q))
-    return [oid_to_str(o) for o in orders]
+    cursor = db["order"].aggregate([{"$match": q}, {"$project": ORDER_LIST_PROJECTION}], batchSize=LIST_BATCH_SIZE)
+    if wants_ndjson(request):
+        return ndjson_stream(cursor, OrderListOut)
+    orders = await cursor.to_list(length=None)
+    return ORDER_LIST_ADAPTER.dump_python([OrderListOut.from_db(o) for o in orders], mode="json")
+
+
+@app.get("/api/orders/{order_id}")
+async def get_order(order_id: str, claims: Dict[str, Any] = Depends(require_user)) -> OrderOut:
+    order = await db["order"].find_one({"_id": parse_oid(order_id, "order")})
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if claims.get("role") != "admin" and claims.get("sub") != order["user_email"]:
+        # same response as a missing order so ids can't be probed
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order
 
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # JWT_SECRET fallback and the products cache are per process, so only
+    # raise WEB_CONCURRENCY once JWT_SECRET is set and the cache is shared
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    # multiple workers need the app as an import string
+    uvicorn.run("main:app", host="0.0.0.0", port=port, loop="uvloop", http="httptools", workers=workers)
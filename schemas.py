@@ -17,7 +17,7 @@ class User(BaseModel):
     """
     name: str = Field(..., description="Full name")
     email: EmailStr = Field(..., description="Email address")
-    password: str = Field(..., description="Hashed password or demo password")
+    password: str = Field(..., description="Argon2 password hash")
     role: str = Field("customer", description="Role: customer or admin")
     approved: bool = Field(False, description="Whether login is approved by admin")
     created_at: Optional[datetime] = None
@@ -15,5 +15,11 @@ mkdir -p logs
 echo "Installing dependencies..."
 pip install -r requirements.txt
 echo "Starting FastAPI server..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1 
+# RELOAD=1 for development (auto-reload implies a single worker)
+if [ "$RELOAD" = "1" ]; then
+  SERVER_OPTS="--reload"
+else
+  SERVER_OPTS="--workers ${WEB_CONCURRENCY:-1}"
+fi
+nohup uvicorn main:app --host 0.0.0.0 --port 8000 --loop uvloop --http httptools $SERVER_OPTS > logs/server.log 2>&1 
 echo "Server started in background"
@@ -0,0 +1,65 @@
+"""
+Request-body handling for POST /api/orders.
+
+The body is decoded with msgspec rather than FastAPI/Pydantic, so these
+check that clients still see the same coercion and 422 error shape. None
+of these requests reach the database.
+"""
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+ITEM = {"product_id": "a" * 24, "title": "PC", "price": 10.5, "quantity": 2}
+
+
+def post_order(**body):
+    return client.post("/api/orders", json={"user_email": "bob@example.com", "items": [ITEM], "total": 21, **body})
+
+
+def test_invalid_field_uses_fastapi_error_shape():
+    res = post_order(items=[{**ITEM, "quantity": 0}])
+    assert res.status_code == 422
+    assert res.json() == {"detail": [{
+        "type": "value_error",
+        "loc": ["body", "items", 0, "quantity"],
+        "msg": "Expected `int` >= 1",
+        "input": 0,
+    }]}
+
+
+def test_missing_field_reported_like_pydantic():
+    res = client.post("/api/orders", json={"user_email": "bob@example.com", "items": []})
+    assert res.status_code == 422
+    assert res.json()["detail"] == [{
+        "type": "missing",
+        "loc": ["body", "total"],
+        "msg": "Field required",
+        "input": {"user_email": "bob@example.com", "items": []},
+    }]
+
+
+def test_invalid_email():
+    res = post_order(user_email="nope")
+    assert res.status_code == 422
+    [err] = res.json()["detail"]
+    assert err["loc"] == ["body", "user_email"]
+    assert err["input"] == "nope"
+
+
+def test_invalid_json():
+    res = client.post("/api/orders", content=b"{", headers={"content-type": "application/json"})
+    assert res.status_code == 422
+    [err] = res.json()["detail"]
+    assert err["type"] == "json_invalid"
+    assert err["loc"] == ["body"]
+
+
+def test_numeric_strings_are_coerced():
+    # lax like Pydantic: "10.5"/"2" are accepted, so validation gets as far
+    # as the total check (22 != 10.5 * 2)
+    res = post_order(items=[{**ITEM, "price": "10.5", "quantity": "2"}], total="22")
+    assert res.status_code == 400
+    assert res.json() == {"detail": "Total mismatch"}